@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Hashable
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+# Odd 64-bit multipliers, one per row (multiply-shift hashing)
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+          0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9)
+
+
+class CountMinSketch:
+    """
+    Approximate access-frequency counter for TinyLFU admission:
+    - depth rows of saturating 4-bit counters (0..15, one byte each)
+    - counters are halved after `sample_size` increments, so old popularity fades
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int, depth: int = 4) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be > 0")
+        if not 1 <= depth <= len(_SEEDS):
+            raise ValueError(f"depth must be within [1, {len(_SEEDS)}]")
+
+        bits = 4
+        while (1 << bits) < capacity:
+            bits += 1
+
+        self.width = 1 << bits
+        self.depth = depth
+        self.sample_size = 10 * capacity
+        self._shift = 64 - bits
+        self._rows = [bytearray(self.width) for _ in range(depth)]
+        self._additions = 0
+
+    def _indexes(self, key: Hashable):
+        # Independent row indexes: top bits of hash * per-row odd multiplier
+        h = hash(key) & _MASK64
+        shift = self._shift
+        return [((h * seed) & _MASK64) >> shift for seed in _SEEDS[:self.depth]]
+
+    def increment(self, key: Hashable) -> None:
+        for row, idx in zip(self._rows, self._indexes(key)):
+            if row[idx] < self.MAX_COUNT:
+                row[idx] += 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[idx] for row, idx in zip(self._rows, self._indexes(key)))
+
+    def _age(self) -> None:
+        """Halve every counter."""
+        self._additions //= 2
+        for i, row in enumerate(self._rows):
+            self._rows[i] = bytearray(c >> 1 for c in row)
+
+    def clear(self) -> None:
+        self._rows = [bytearray(self.width) for _ in range(self.depth)]
+        self._additions = 0
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Iterable, Optional, Tuple
+from typing import Any, Callable, Iterable, Optional, Tuple
 
 from redis.asyncio import Redis
 from redis.exceptions import RedisError
 
-from .redis_mixins import RedisTagMixin, RedisPatternMixin
+from .async_utils import AsyncRedisKeyLock
+from .redis_mixins import INVALIDATE_TAGS_LUA, RedisTagMixin, RedisPatternMixin
 
 
 class AsyncCustomCache(ABC):
@@ -53,16 +54,23 @@ class AioredisCache(AsyncCustomCache, RedisTagMixin, RedisPatternMixin):
             value_prefix: str = "rc:",
             meta_prefix: str = "rcmeta",
             pickle_protocol: int = -1,
+            serializer: Optional[Callable[[Any], bytes]] = None,
+            deserializer: Optional[Callable[[bytes], Any]] = None,
     ) -> None:
         if default_ttl <= 0:
             raise ValueError("default_ttl must be > 0 seconds")
 
+        self._check_raw_responses(client)
+
         self.default_ttl = float(default_ttl)
         self.r = client
+        self._invalidate_tags_script = client.register_script(INVALIDATE_TAGS_LUA)
         super().__init__(
             value_prefix=value_prefix,
             meta_prefix=meta_prefix,
-            pickle_protocol=pickle_protocol
+            pickle_protocol=pickle_protocol,
+            serializer=serializer,
+            deserializer=deserializer,
         )
 
     async def aget(self, key: str) -> tuple[bool, Any]:
@@ -80,6 +88,20 @@ class AioredisCache(AsyncCustomCache, RedisTagMixin, RedisPatternMixin):
         except Exception:
             return False, None
 
+    async def aget_or_acquire(self, key: str, lock: AsyncRedisKeyLock) -> tuple[bool, Any]:
+        """
+        Wait for key or the distributed lock, one round trip per attempt.
+        On a miss, `lock.token` tells whether the lock was taken.
+        """
+        blob = await lock.acquire_or_get(key)
+        if blob is None:
+            return False, None
+
+        try:
+            return True, self._deserialize_value(blob)
+        except Exception:
+            return False, None
+
     async def aset(
             self,
             key: str,
@@ -89,37 +111,21 @@ class AioredisCache(AsyncCustomCache, RedisTagMixin, RedisPatternMixin):
             tags: Optional[Iterable[str]] = None,
     ) -> None:
         """Set value in cache with tags."""
+        if tags is not None:
+            tags = set(tags)  # may be a one-shot iterator; it is read twice below
         blob, ex, px, kt_key = self._prepare_set_operation(key, value, ttl, tags)
 
-        # First set value and read old tags
+        # Set value, read old tags and index new ones in one round trip
         p = self.r.pipeline(transaction=False)
         self._prepare_pipeline_for_set(p, key, blob, ex, px, kt_key, tags)
         res = await p.execute()
 
-        # Process tags if specified
+        # Drop tags that are no longer attached; new ones went out with the SET
         if tags is not None:
             old_tags = self._extract_old_tags_from_pipeline_result(res, tags is not None)
-            await self._handle_tags_update(key, kt_key, tags, old_tags, ex, px)
-
-    async def _handle_tags_update(
-        self,
-        key: str,
-        kt_key: str,
-        new_tags: Iterable[str],
-        old_tags: set[str],
-        ex: Optional[int],
-        px: Optional[int]
-    ) -> None:
-        """Update tags for key."""
-        tags_to_remove, tags_to_add = self._calculate_tags_diff(old_tags, new_tags)
-
-        # Remove old tags not in new ones
-        if tags_to_remove:
-            await self._remove_tags(key, kt_key, tags_to_remove)
-
-        # Add new tags
-        if tags_to_add:
-            await self._add_tags(key, kt_key, tags_to_add, ex, px)
+            tags_to_remove = self._calculate_tags_to_remove(old_tags, tags)
+            if tags_to_remove:
+                await self._remove_tags(key, kt_key, tags_to_remove)
 
     async def _remove_tags(self, key: str, kt_key: str, tags_to_remove: set[str]) -> None:
         """Remove tags from indexes."""
@@ -132,19 +138,6 @@ class AioredisCache(AsyncCustomCache, RedisTagMixin, RedisPatternMixin):
         self._prepare_remove_tags_pipeline_second_pass(p, tags_to_remove, results, kt_key)
         await p.execute()
 
-    async def _add_tags(
-        self,
-        key: str,
-        kt_key: str,
-        tags: set[str],
-        ex: Optional[int],
-        px: Optional[int]
-    ) -> None:
-        """Add tags to indexes."""
-        p = self.r.pipeline(transaction=False)
-        self._prepare_add_tags_pipeline(p, key, kt_key, tags, ex, px)
-        await p.execute()
-
     async def adelete(self, key: str) -> None:
         """Delete key and associated tags."""
         kt_key = self._ktags_key(key)
@@ -184,46 +177,13 @@ class AioredisCache(AsyncCustomCache, RedisTagMixin, RedisPatternMixin):
                 break
 
     async def ainvalidate_tags(self, tags: Iterable[str]) -> None:
-        """Invalidate cache by tags."""
-        tags_list = list(tags)
-        if not tags_list:
-            return
-
-        tag_keys = [self._tagset_key(t) for t in tags_list]
-
-        try:
-            union = await self.r.sunion(tag_keys)
-        except RedisError:
-            return
-
-        if not union:
+        """Invalidate cache by tags (single Lua call)."""
+        tag_keys = [self._tagset_key(t) for t in tags]
+        if not tag_keys:
             return
 
-        keys_to_invalidate = [
-            k.decode("utf-8") if isinstance(k, (bytes, bytearray)) else k
-            for k in union
-        ]
-
-        await self._batch_invalidate_keys(keys_to_invalidate, tags_list)
-
-    async def _batch_invalidate_keys(self, keys: list[str], tags: list[str]) -> None:
-        """Batch invalidate keys."""
-        p = self.r.pipeline(transaction=False)
-
-        # Delete all value keys
-        for key in keys:
-            p.delete(key)
-
-        # Delete all meta keys
-        for key in keys:
-            p.delete(self._ktags_key(key))
-
-        # Clear tagsets
-        for tag in tags:
-            p.delete(self._tagset_key(tag))
-
         try:
-            await p.execute()
+            await self._invalidate_tags_script(keys=tag_keys, args=[self._ktags_prefix()])
         except RedisError:
             pass
 
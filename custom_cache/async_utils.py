@@ -17,6 +17,19 @@ end
 """
 
 
+# One round trip for a contender: cached value, lock ownership, or time to wait
+_ACQUIRE_OR_GET_LUA = """
+local v = redis.call("GET", KEYS[1])
+if v then
+  return {"HIT", v}
+end
+if redis.call("SET", KEYS[2], ARGV[1], "NX", "PX", ARGV[2]) then
+  return {"LEAD"}
+end
+return {"WAIT", redis.call("PTTL", KEYS[2])}
+"""
+
+
 class AsyncRedisKeyLock:
     """
     Simple distributed async lock by key.
@@ -47,6 +60,45 @@ class AsyncRedisKeyLock:
                 return False
             await asyncio.sleep(0.01)  # light backoff
 
+    async def try_acquire(self) -> bool:
+        """Single non-blocking lock attempt."""
+        token = uuid4().hex
+        try:
+            ok = await self.r.set(self.lock_key, token, nx=True, px=self.ttl_ms)
+        except RedisError:
+            return False
+        if ok:
+            self.token = token
+        return bool(ok)
+
+    async def acquire_or_get(self, value_key: str) -> Optional[bytes]:
+        """
+        Until timeout_sec, atomically (Lua) either read value_key or take the lock.
+        Returns the raw value if it appeared; otherwise `token` is set only if
+        the lock was taken.
+        """
+        token = uuid4().hex
+        # register_script: EVALSHA, reloading the script on NOSCRIPT
+        script = self.r.register_script(_ACQUIRE_OR_GET_LUA)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_sec
+        while True:
+            try:
+                reply = await script(keys=[value_key, self.lock_key], args=[token, self.ttl_ms])
+            except RedisError:
+                return None
+            status = reply[0].decode("utf-8") if isinstance(reply[0], bytes) else reply[0]
+            if status == "HIT":
+                return reply[1]
+            if status == "LEAD":
+                self.token = token
+                return None
+            if loop.time() >= deadline:
+                return None
+            # Poll no later than the holder's lock expiry
+            pttl = int(reply[1])
+            await asyncio.sleep(0.01 if pttl <= 0 else min(0.01, pttl / 1000))
+
     async def release(self) -> None:
         if not self.token:
             return
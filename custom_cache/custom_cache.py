@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import random
 import threading
 import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
 
 from redis import Redis
 from redis.exceptions import RedisError
 
-from .redis_mixins import RedisTagMixin, RedisPatternMixin
+from .admission import CountMinSketch
+from .redis_mixins import INVALIDATE_TAGS_LUA, REPAIR_TAGS_LUA, RedisTagMixin, RedisPatternMixin
 
 
 class CustomCache(ABC):
@@ -30,6 +34,14 @@ class CustomCache(ABC):
             tags: Optional[Iterable[str]] = None,
     ) -> None: ...
 
+    def set_many(
+            self,
+            items: Iterable[Tuple[str, Any, float, Optional[Iterable[str]]]],
+    ) -> None:
+        """Set several (key, value, ttl, tags) entries."""
+        for key, value, ttl, tags in items:
+            self.set(key, value, ttl, tags=tags)
+
     @abstractmethod
     def delete(self, key: str) -> None: ...
 
@@ -43,17 +55,37 @@ class CustomCache(ABC):
 class InMemoryCache(CustomCache):
     """
     Enhanced in-memory cache with thread safety.
+
+    Optionally bounded by `max_size`: the oldest entry is evicted to make room.
+    With admission="tinylfu" a new key is only admitted if its estimated access
+    frequency beats that eviction victim's, so one-shot keys don't push out hot ones.
     """
 
-    def __init__(self, *, default_ttl: float) -> None:
+    def __init__(
+        self,
+        *,
+        default_ttl: float,
+        max_size: Optional[int] = None,
+        admission: Optional[str] = None,
+    ) -> None:
         if default_ttl <= 0:
             raise ValueError("default_ttl must be > 0 seconds")
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size must be > 0")
+        if admission not in (None, "tinylfu"):
+            raise ValueError("admission must be None or 'tinylfu'")
+        if admission is not None and max_size is None:
+            raise ValueError("admission requires max_size")
 
         self.default_ttl = float(default_ttl)
-        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self.max_size = max_size
+        # Bounded caches need move_to_end(): re-queueing a kept eviction victim
+        # must never remove it, since reads don't take the lock
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = OrderedDict() if max_size is not None else {}
         self._lock = threading.RLock()  # Use RLock for recursive calls
         self._tag_index: Dict[str, Set[str]] = {}
         self._key_tags: Dict[str, Set[str]] = {}
+        self._sketch: Optional[CountMinSketch] = CountMinSketch(max_size) if admission else None
 
     @contextmanager
     def _locked(self):
@@ -106,24 +138,40 @@ class InMemoryCache(CustomCache):
             return True
         return False
 
+    def _read_lockfree(self, key: str) -> Optional[Tuple[Optional[float], bytes]]:
+        """
+        Lock-free read: entries are immutable tuples replaced by a single dict
+        store, so one dict lookup is atomic. Only expired entries take the lock
+        (for cleanup, which re-checks expiry against concurrent writers).
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expires_at, _ = item
+        if expires_at is not None and expires_at <= self._now():
+            with self._locked():
+                self._cleanup_expired_unlocked(key)
+            return None
+        return item
+
     def get(self, key: str) -> tuple[bool, Any]:
         """Get value from cache."""
-        with self._locked():
-            if self._cleanup_expired_unlocked(key):
-                return False, None
+        if self._sketch is not None:
+            self._sketch.increment(key)
 
-            item = self._data.get(key)
-            if item is None:
-                return False, None
-
-            _, blob = item
+        item = self._read_lockfree(key)
+        if item is None:
+            return False, None
 
         try:
-            return True, self._deserialize_value(blob)
+            return True, self._deserialize_value(item[1])
         except Exception:
             with self._locked():
-                self._data.pop(key, None)
-                self._unlink_key_unlocked(key)
+                # Don't drop a value another thread wrote in the meantime
+                if self._data.get(key) is item:
+                    self._data.pop(key, None)
+                    self._unlink_key_unlocked(key)
             return False, None
 
     def set(
@@ -135,6 +183,27 @@ class InMemoryCache(CustomCache):
         tags: Optional[Iterable[str]] = None
     ) -> None:
         """Set value in cache."""
+        expires_at, blob = self._prepare_entry(value, ttl)
+
+        with self._locked():
+            self._set_unlocked(key, expires_at, blob, tags)
+
+    def set_many(
+        self,
+        items: Iterable[Tuple[str, Any, float, Optional[Iterable[str]]]],
+    ) -> None:
+        """Set several (key, value, ttl, tags) entries under a single lock acquisition."""
+        prepared = [
+            (key, *self._prepare_entry(value, ttl), tags)
+            for key, value, ttl, tags in items
+        ]
+
+        with self._locked():
+            for key, expires_at, blob, tags in prepared:
+                self._set_unlocked(key, expires_at, blob, tags)
+
+    def _prepare_entry(self, value: Any, ttl: float) -> Tuple[float, bytes]:
+        """Validate TTL and serialize value (outside the lock)."""
         if ttl is None or ttl <= 0:
             raise ValueError("ttl must be a positive number (seconds)")
 
@@ -145,19 +214,51 @@ class InMemoryCache(CustomCache):
         except Exception as e:
             raise ValueError(f"Cannot serialize value: {e}")
 
-        with self._locked():
-            if key in self._data:
-                self._unlink_key_unlocked(key)
+        return expires_at, blob
+
+    def _set_unlocked(
+        self,
+        key: str,
+        expires_at: float,
+        blob: bytes,
+        tags: Optional[Iterable[str]],
+    ) -> None:
+        """Store entry and index its tags (without locking)."""
+        if self._sketch is not None:
+            self._sketch.increment(key)
 
-            self._data[key] = (expires_at, blob)
+        if key in self._data:
+            self._unlink_key_unlocked(key)
+        elif self.max_size is not None and len(self._data) >= self.max_size:
+            if not self._make_room_unlocked(key):
+                return
 
-            if tags:
-                tag_set = set(tags)
-                self._key_tags[key] = tag_set
-                for tag in tag_set:
-                    if tag not in self._tag_index:
-                        self._tag_index[tag] = set()
-                    self._tag_index[tag].add(key)
+        self._data[key] = (expires_at, blob)
+
+        if tags:
+            tag_set = set(tags)
+            self._key_tags[key] = tag_set
+            for tag in tag_set:
+                if tag not in self._tag_index:
+                    self._tag_index[tag] = set()
+                self._tag_index[tag].add(key)
+
+    def _make_room_unlocked(self, key: str) -> bool:
+        """Evict the oldest entry for `key`, unless TinyLFU rejects `key` (without locking)."""
+        victim = next(iter(self._data))
+
+        if (
+            self._sketch is None
+            or self._is_expired_unlocked(victim)
+            or self._sketch.estimate(key) > self._sketch.estimate(victim)
+        ):
+            self._data.pop(victim, None)
+            self._unlink_key_unlocked(victim)
+            return True
+
+        # Victim is hotter: keep it, moved to the back so the next contest sees another entry
+        self._data.move_to_end(victim)
+        return False
 
     def delete(self, key: str) -> None:
         """Delete key from cache."""
@@ -171,25 +272,21 @@ class InMemoryCache(CustomCache):
             self._data.clear()
             self._tag_index.clear()
             self._key_tags.clear()
+            if self._sketch is not None:
+                self._sketch.clear()
 
     def invalidate_tags(self, tags: Iterable[str]) -> None:
         """Invalidate cache by tags."""
         with self._locked():
-            keys_to_drop: Set[str] = set()
-
+            # Pop each tag's key set outright: cost is O(keys with tag), not O(cache)
             for tag in tags:
-                tag_keys = self._tag_index.get(tag)
-                if tag_keys:
-                    keys_to_drop.update(tag_keys)
-
-            for key in keys_to_drop:
-                self._data.pop(key, None)
-                self._unlink_key_unlocked(key)
+                for key in self._tag_index.pop(tag, ()):
+                    self._data.pop(key, None)
+                    self._unlink_key_unlocked(key)
 
     def __contains__(self, key: str) -> bool:
         """Check if key exists in cache."""
-        with self._locked():
-            return not self._cleanup_expired_unlocked(key) and key in self._data
+        return self._read_lockfree(key) is not None
 
     def __getitem__(self, key: str) -> Any:
         """Get value as dict[key]."""
@@ -228,16 +325,37 @@ class RedisCache(CustomCache, RedisTagMixin, RedisPatternMixin):
             value_prefix: str = "rc:",
             meta_prefix: str = "rcmeta",
             pickle_protocol: int = -1,
+            serializer: Optional[Callable[[Any], bytes]] = None,
+            deserializer: Optional[Callable[[bytes], Any]] = None,
+            tag_validate_prob: float = 0.0,
+            tag_validate_executor: Optional[Executor] = None,
     ) -> None:
+        """
+        tag_validate_prob: fraction of hits whose tag-index membership is
+        verified (and repaired) in the background; 0 disables it.
+        tag_validate_executor: where verification runs (defaults to a small
+        thread pool created on first use).
+        """
         if default_ttl <= 0:
             raise ValueError("default_ttl must be > 0 seconds")
+        if not 0.0 <= tag_validate_prob <= 1.0:
+            raise ValueError("tag_validate_prob must be within [0, 1]")
+
+        self._check_raw_responses(client)
 
         self.default_ttl = float(default_ttl)
         self.r = client
+        self._invalidate_tags_script = client.register_script(INVALIDATE_TAGS_LUA)
+        self._repair_tags_script = client.register_script(REPAIR_TAGS_LUA)
+        self.tag_validate_prob = float(tag_validate_prob)
+        self._tag_validate_executor = tag_validate_executor
+        self._executor_lock = threading.Lock()
         super().__init__(
             value_prefix=value_prefix,
             meta_prefix=meta_prefix,
-            pickle_protocol=pickle_protocol
+            pickle_protocol=pickle_protocol,
+            serializer=serializer,
+            deserializer=deserializer,
         )
 
     def get(self, key: str) -> tuple[bool, Any]:
@@ -251,10 +369,34 @@ class RedisCache(CustomCache, RedisTagMixin, RedisPatternMixin):
             return False, None
 
         try:
-            return True, self._deserialize_value(blob)
+            value = self._deserialize_value(blob)
         except Exception:
             return False, None
 
+        if self.tag_validate_prob and random.random() < self.tag_validate_prob:
+            # Off the hit path: the caller gets the value without waiting
+            try:
+                self._get_tag_validate_executor().submit(self._verify_tag_membership, key)
+            except RuntimeError:
+                pass  # executor shut down (or interpreter exiting): skip the check
+        return True, value
+
+    def _get_tag_validate_executor(self) -> Executor:
+        if self._tag_validate_executor is None:
+            with self._executor_lock:
+                if self._tag_validate_executor is None:
+                    self._tag_validate_executor = ThreadPoolExecutor(
+                        max_workers=2, thread_name_prefix="relaycache-tags"
+                    )
+        return self._tag_validate_executor
+
+    def _verify_tag_membership(self, key: str) -> None:
+        """Re-add key to any tagset that lost it, so tag invalidation still reaches it."""
+        try:
+            self._repair_tags_script(keys=[key, self._ktags_key(key)], args=[self._tagset_prefix()])
+        except RedisError:
+            pass
+
     def set(
         self,
         key: str,
@@ -264,6 +406,8 @@ class RedisCache(CustomCache, RedisTagMixin, RedisPatternMixin):
         tags: Optional[Iterable[str]] = None
     ) -> None:
         """Set value in Redis with tags."""
+        if tags is not None:
+            tags = set(tags)  # may be a one-shot iterator; it is read twice below
         blob, ex, px, kt_key = self._prepare_set_operation(key, value, ttl, tags)
 
         p = self.r.pipeline(transaction=False)
@@ -272,25 +416,9 @@ class RedisCache(CustomCache, RedisTagMixin, RedisPatternMixin):
 
         if tags is not None:
             old_tags = self._extract_old_tags_from_pipeline_result(res, tags is not None)
-            self._handle_tags_update(key, kt_key, tags, old_tags, ex, px)
-
-    def _handle_tags_update(
-        self,
-        key: str,
-        kt_key: str,
-        new_tags: Iterable[str],
-        old_tags: set[str],
-        ex: Optional[int],
-        px: Optional[int]
-    ) -> None:
-        """Update tags for key."""
-        tags_to_remove, tags_to_add = self._calculate_tags_diff(old_tags, new_tags)
-
-        if tags_to_remove:
-            self._remove_tags(key, kt_key, tags_to_remove)
-
-        if tags_to_add:
-            self._add_tags(key, kt_key, tags_to_add, ex, px)
+            tags_to_remove = self._calculate_tags_to_remove(old_tags, tags)
+            if tags_to_remove:
+                self._remove_tags(key, kt_key, tags_to_remove)
 
     def _remove_tags(self, key: str, kt_key: str, tags_to_remove: set[str]) -> None:
         """Remove tags from indexes."""
@@ -306,22 +434,6 @@ class RedisCache(CustomCache, RedisTagMixin, RedisPatternMixin):
         except RedisError:
             pass
 
-    def _add_tags(
-        self,
-        key: str,
-        kt_key: str,
-        tags: set[str],
-        ex: Optional[int],
-        px: Optional[int]
-    ) -> None:
-        """Add tags to indexes."""
-        try:
-            p = self.r.pipeline(transaction=False)
-            self._prepare_add_tags_pipeline(p, key, kt_key, tags, ex, px)
-            p.execute()
-        except RedisError:
-            pass
-
     def delete(self, key: str) -> None:
         """Delete key and associated tags."""
         try:
@@ -360,42 +472,16 @@ class RedisCache(CustomCache, RedisTagMixin, RedisPatternMixin):
                 break
 
     def invalidate_tags(self, tags: Iterable[str]) -> None:
-        """Invalidate cache by tags."""
-        tags_list = list(tags)
-        if not tags_list:
+        """Invalidate cache by tags (single Lua call)."""
+        tag_keys = [self._tagset_key(t) for t in tags]
+        if not tag_keys:
             return
 
         try:
-            tag_keys = [self._tagset_key(t) for t in tags_list]
-            union = self.r.sunion(tag_keys)
-
-            if not union:
-                return
-
-            keys_to_invalidate = [
-                k.decode("utf-8") if isinstance(k, (bytes, bytearray)) else k
-                for k in union
-            ]
-
-            self._batch_invalidate_keys(keys_to_invalidate, tags_list)
-
+            self._invalidate_tags_script(keys=tag_keys, args=[self._ktags_prefix()])
         except RedisError:
             pass
 
-    def _batch_invalidate_keys(self, keys: list[str], tags: list[str]) -> None:
-        """Batch invalidate keys."""
-        p = self.r.pipeline(transaction=False)
-
-        for key in keys:
-            p.delete(key)
-            p.delete(self._ktags_key(key))
-
-        # Delete tagsets
-        for tag in tags:
-            p.delete(self._tagset_key(tag))
-
-        p.execute()
-
     def __contains__(self, key: str) -> bool:
         """Check if key exists."""
         try:
@@ -1,30 +1,48 @@
 from __future__ import annotations
 
+import asyncio
 import functools
 import inspect
+import os
+from timeit import default_timer
 from typing import Any, Callable, Optional, Iterable
 
 from .async_custom_cache import AsyncCustomCache
-from .custom_cache import default_backend
+from .custom_cache import CustomCache, default_backend
 from .key_builder import KeyBuilder
-from .utils import Singleflight, AsyncSingleflight, resolve_tags, BackendT, \
-    make_async_redis_lock, make_sync_redis_lock
+from .utils import Singleflight, AsyncSingleflight, make_tag_resolver, BackendT, \
+    make_async_redis_lock, make_sync_redis_lock, XFetchEntry, xfetch_wrap, xfetch_unwrap
 
 singleflight = Singleflight()
 async_singleflight = AsyncSingleflight()
 
+DISABLE_ENV_VAR = "RELAYCACHE_DISABLED"
+
+
+def _cache_disabled() -> bool:
+    return os.environ.get(DISABLE_ENV_VAR, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def _is_backend_factory(backend: Any) -> bool:
+    # Duck-typed backends (anything with get/aget) are used as-is, even if callable
+    if backend is None or isinstance(backend, (CustomCache, AsyncCustomCache)):
+        return False
+    return callable(backend) and not (hasattr(backend, "get") or hasattr(backend, "aget"))
+
 
 def cache(
         ttl: Optional[float] = None,
         *,
         key: Optional[Callable[..., str]] = None,
         namespace: Optional[str] = None,
-        backend: Optional[BackendT] = None,
+        backend: Optional[BackendT | Callable[[], BackendT]] = None,
         key_builder: Optional[KeyBuilder] = None,
         tags: Optional[Iterable[str] | Callable[..., Iterable[str]]] = None,
         distributed_singleflight: bool = False,
         dist_lock_ttl: float = 5.0,
         dist_lock_timeout: float = 2.0,
+        early_refresh: bool = False,
+        early_refresh_beta: float = 1.0,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     """
     Cache decorator with support for sync/async functions and backends.
@@ -33,65 +51,131 @@ def cache(
         ttl: Required, > 0 (seconds)
         key: Custom key building function (otherwise KeyBuilder)
         namespace: Prefix for KeyBuilder
-        backend: CustomCache (sync) or AsyncCustomCache (async)
-        tags: Iterable or callable(*args, **kwargs) -> iterable
+        backend: CustomCache (sync) or AsyncCustomCache (async), or a zero-arg
+            factory returning one (not called when caching is disabled)
+        tags: Iterable, callable(*args, **kwargs) -> iterable, or format templates
+            filled from the call's arguments, e.g. ("user:{user_id}", "users")
         distributed_singleflight: Cross-process coordination (Redis lock)
         dist_lock_ttl: Distributed lock TTL in seconds
         dist_lock_timeout: Distributed lock timeout in seconds
+        early_refresh: Probabilistic early recompute (XFetch) to avoid expiry stampedes
+        early_refresh_beta: XFetch beta; > 1 favours earlier refresh
+
+    If the RELAYCACHE_DISABLED environment variable is set (and not "0"/"false"/"no"),
+    functions are returned unwrapped and no backend is created.
     """
     if ttl is None or ttl <= 0:
         raise ValueError("ttl must be a positive number (seconds)")
 
+    if _cache_disabled():
+        return lambda func: func
+
+    if _is_backend_factory(backend):
+        backend = backend()
     store: BackendT = backend or default_backend
     kb = key_builder or KeyBuilder()
 
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        build_key = kb.for_func(func, namespace)
+        resolve_tags = make_tag_resolver(tags, func)
+
         # -------------------- ASYNC FUNCTION --------------------
         if inspect.iscoroutinefunction(func):
             is_async_backend = isinstance(store, AsyncCustomCache)
 
             @functools.wraps(func)
             async def awrapper(*args: Any, **kwargs: Any) -> Any:
-                k = key(*args, **kwargs) if key else kb.build(func, args, kwargs, namespace)
+                k = key(*args, **kwargs) if key else build_key(args, kwargs)
 
-                async def _lookup():
+                # Concurrent calls for the same key in this event loop share one
+                # future, so duplicates never reach the backend
+                pending = async_singleflight.inflight()
+                while k in pending:
+                    fut = pending[k]
+                    try:
+                        return await asyncio.shield(fut)
+                    except asyncio.CancelledError:
+                        if not fut.cancelled():
+                            raise  # this caller was cancelled
+                        # the leader was cancelled, not us: retry (possibly as leader)
+
+                fut = asyncio.get_running_loop().create_future()
+                pending[k] = fut
+                try:
+                    result = await _aresolve(k, args, kwargs)
+                except Exception as e:
+                    fut.set_exception(e)
+                    fut.exception()  # mark retrieved when nobody else awaited it
+                    raise
+                except BaseException:
+                    fut.cancel()
+                    raise
+                else:
+                    fut.set_result(result)
+                    return result
+                finally:
+                    if pending.get(k) is fut:
+                        del pending[k]
+
+            async def _aresolve(k: str, args: tuple, kwargs: dict) -> Any:
+                stale: Optional[XFetchEntry] = None
+
+                async def _get():
                     if is_async_backend:
                         return await store.aget(k)
                     else:
                         return store.get(k)
 
+                async def _lookup():
+                    hit, value = await _get()
+                    if hit and early_refresh:
+                        return xfetch_unwrap(value, stale)
+                    return hit, value
+
                 async def _compute_and_set():
+                    started = default_timer()
                     result = await func(*args, **kwargs)
-                    t = resolve_tags(tags, args, kwargs)
+                    t = resolve_tags(args, kwargs)
+                    stored = xfetch_wrap(result, default_timer() - started, ttl) if early_refresh else result
                     if is_async_backend:
-                        await store.aset(k, result, ttl=ttl, tags=t)
+                        await store.aset(k, stored, ttl=ttl, tags=t)
                     else:
-                        store.set(k, result, ttl=ttl, tags=t)
+                        store.set(k, stored, ttl=ttl, tags=t)
                     return result
 
-                hit, value = await _lookup()
+                hit, value = await _get()
                 if hit:
-                    return value
-
-                async with (await async_singleflight.for_key(k)):
-                    hit, value = await _lookup()
-                    if hit:
+                    if not (early_refresh and isinstance(value, XFetchEntry)):
                         return value
+                    if not value.should_refresh(early_refresh_beta):
+                        return value.value
+                    stale = value
 
-                    if distributed_singleflight:
-                        arlock = make_async_redis_lock(store, k, dist_lock_ttl, dist_lock_timeout)
-                        if arlock:
-                            if not await arlock.acquire():
-                                hit, value = await _lookup()
-                                return value if hit else await _compute_and_set()
-                            try:
-                                hit, value = await _lookup()
-                                return value if hit else await _compute_and_set()
-                            finally:
-                                await arlock.release()
+                arlock = None
+                if distributed_singleflight:
+                    arlock = make_async_redis_lock(store, k, dist_lock_ttl, dist_lock_timeout)
 
+                if arlock is None:
                     return await _compute_and_set()
 
+                if stale is not None:
+                    # Early refresh of a live value: lead if the lock is free, else serve stale
+                    if not await arlock.try_acquire():
+                        return stale.value
+                else:
+                    # Value check and lock attempt are one Lua call per round trip
+                    hit, value = await store.aget_or_acquire(k, arlock)
+                    if hit:
+                        return xfetch_unwrap(value, None)[1] if early_refresh else value
+                    if arlock.token is None:
+                        hit, value = await _lookup()
+                        return value if hit else await _compute_and_set()
+
+                try:
+                    return await _compute_and_set()
+                finally:
+                    await arlock.release()
+
             return awrapper
 
         # -------------------- SYNC FUNCTION --------------------
@@ -102,22 +186,57 @@ def cache(
                     "Use an async function or provide a sync backend."
                 )
 
+            if not distributed_singleflight and not early_refresh:
+                # Common case: straight-line wrapper with no per-call feature branches
+                @functools.wraps(func)
+                def swrapper_plain(*args: Any, **kwargs: Any) -> Any:
+                    k = key(*args, **kwargs) if key else build_key(args, kwargs)
+
+                    hit, value = store.get(k)
+                    if hit:
+                        return value
+
+                    with singleflight.for_key(k):
+                        hit, value = store.get(k)
+                        if hit:
+                            return value
+
+                        result = func(*args, **kwargs)
+                        store.set(k, result, ttl=ttl, tags=resolve_tags(args, kwargs))
+                        return result
+
+                return swrapper_plain
+
             @functools.wraps(func)
             def swrapper(*args: Any, **kwargs: Any) -> Any:
-                k = key(*args, **kwargs) if key else kb.build(func, args, kwargs, namespace)
+                k = key(*args, **kwargs) if key else build_key(args, kwargs)
+                stale: Optional[XFetchEntry] = None
 
                 def _lookup():
-                    return store.get(k)
+                    hit, value = store.get(k)
+                    if hit and early_refresh:
+                        return xfetch_unwrap(value, stale)
+                    return hit, value
 
                 def _compute_and_set():
+                    started = default_timer()
                     result = func(*args, **kwargs)
-                    t = resolve_tags(tags, args, kwargs)
-                    store.set(k, result, ttl=ttl, tags=t)
+                    t = resolve_tags(args, kwargs)
+                    stored = xfetch_wrap(result, default_timer() - started, ttl) if early_refresh else result
+                    store.set(k, stored, ttl=ttl, tags=t)
                     return result
 
-                hit, value = _lookup()
+                def _fallback():
+                    # Someone else holds the lock: serve the stale value if we have one
+                    return stale.value if stale is not None else _compute_and_set()
+
+                hit, value = store.get(k)
                 if hit:
-                    return value
+                    if not (early_refresh and isinstance(value, XFetchEntry)):
+                        return value
+                    if not value.should_refresh(early_refresh_beta):
+                        return value.value
+                    stale = value
 
                 with singleflight.for_key(k):
                     hit, value = _lookup()
@@ -127,9 +246,11 @@ def cache(
                     if distributed_singleflight:
                         rlock = make_sync_redis_lock(store, k, dist_lock_ttl, dist_lock_timeout)
                         if rlock:
-                            if not rlock.acquire():
+                            # Early refresh of a live value: one attempt, else serve stale
+                            acquired = rlock.try_acquire() if stale is not None else rlock.acquire()
+                            if not acquired:
                                 hit, value = _lookup()
-                                return value if hit else _compute_and_set()
+                                return value if hit else _fallback()
                             try:
                                 hit, value = _lookup()
                                 return value if hit else _compute_and_set()
@@ -3,11 +3,18 @@ import hashlib
 import pickle
 from typing import Any, Callable, Optional, Tuple
 
+# Pinned (not HIGHEST_PROTOCOL) so keys stay identical across interpreter versions
+_PICKLE_PROTOCOL = 5
+
 
 class KeyBuilder:
     """
     Builds keys in format:
-    <prefix>:<namespace(optional)>:<module>.<qualname>:<sha256(args, kwargs)>
+    <prefix>:<namespace(optional)>:<module>.<qualname>:<digest(args, kwargs)>
+
+    The digest is sha256 unless `hash_factory` is given (e.g. xxhash.xxh3_128
+    from relaycache[speedups]); it is never picked implicitly, because every
+    process sharing a backend must build identical keys.
     """
     def __init__(
         self,
@@ -27,11 +34,23 @@ class KeyBuilder:
 
     @staticmethod
     def _payload(args: Tuple[Any, ...], kwargs: dict) -> bytes:
+        # Sorted kwargs: f(a=1, b=2) and f(b=2, a=1) share a key. Still a dict,
+        # so the payload is byte-identical to the original unsorted format
+        # for calls without kwargs or with kwargs already in sorted order
+        if len(kwargs) > 1:
+            kwargs = dict(sorted(kwargs.items()))
         try:
-            return pickle.dumps((args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+            return pickle.dumps((args, kwargs), protocol=_PICKLE_PROTOCOL)
         except Exception:
             return repr((args, kwargs)).encode("utf-8")
 
+    def _head(self, func: Callable[..., Any], namespace: Optional[str]) -> str:
+        base = self._func_base(func)
+        ns = namespace or self.namespace
+        if ns:
+            base = f"{ns}:{base}"
+        return f"{self.prefix}:{base}:"
+
     def build(
         self,
         func: Callable[..., Any],
@@ -39,12 +58,30 @@ class KeyBuilder:
         kwargs: dict,
         namespace: Optional[str] = None,
     ) -> str:
-        base = self._func_base(func)
-        ns = namespace or self.namespace
-        if ns:
-            base = f"{ns}:{base}"
-
         h = self.hash_factory()
         h.update(self._payload(args, kwargs))
-        digest = h.hexdigest()
-        return f"{self.prefix}:{base}:{digest}"
\ No newline at end of file
+        return self._head(func, namespace) + h.hexdigest()
+
+    def for_func(
+        self,
+        func: Callable[..., Any],
+        namespace: Optional[str] = None,
+    ) -> Callable[[Tuple[Any, ...], dict], str]:
+        """
+        Key function bound to `func` at decoration time: the
+        prefix/namespace/qualname part is computed once instead of per call.
+        """
+        if type(self).build is not KeyBuilder.build:
+            # Respect subclasses that customize build()
+            return lambda args, kwargs: self.build(func, args, kwargs, namespace)
+
+        head = self._head(func, namespace)
+        hash_factory = self.hash_factory
+        payload = self._payload
+
+        def build_key(args: Tuple[Any, ...], kwargs: dict) -> str:
+            h = hash_factory()
+            h.update(payload(args, kwargs))
+            return head + h.hexdigest()
+
+        return build_key
@@ -2,13 +2,56 @@ from __future__ import annotations
 
 import hashlib
 import pickle
-from typing import Any, Iterable, Optional, Set, Union, Tuple
+from typing import Any, Callable, Iterable, Optional, Set, Union, Tuple
 
 from redis import Redis
 from redis.asyncio import Redis as AsyncRedis
 from redis.exceptions import RedisError
 
 
+# 1-byte payload tags used when a custom serializer is configured
+_TAG_CUSTOM = b"S"
+_TAG_PICKLE = b"P"
+
+
+# Server-side tag invalidation: one round trip however many tags/members.
+# KEYS = tagset keys, ARGV[1] = per-key tags prefix ("<meta>:kt:").
+# DELs are batched to stay well below Lua's unpack() limit.
+INVALIDATE_TAGS_LUA = """
+local kt_prefix = ARGV[1]
+local removed = 0
+for _, tagset in ipairs(KEYS) do
+  local members = redis.call("SMEMBERS", tagset)
+  for i = 1, #members, 500 do
+    local batch = {}
+    for j = i, math.min(i + 499, #members) do
+      local k = members[j]
+      batch[#batch + 1] = k
+      batch[#batch + 1] = kt_prefix .. redis.sha1hex(k)
+    end
+    removed = removed + redis.call("DEL", unpack(batch))
+  end
+  redis.call("DEL", tagset)
+end
+return removed
+"""
+
+
+# Tag-index repair, atomic so it cannot race invalidation or a retag: only
+# runs if the value still exists, and only for tags still in its kt set.
+# KEYS = value key, per-key tags key; ARGV[1] = tagset prefix ("<meta>:tag:").
+REPAIR_TAGS_LUA = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+  return 0
+end
+local repaired = 0
+for _, tag in ipairs(redis.call("SMEMBERS", KEYS[2])) do
+  repaired = repaired + redis.call("SADD", ARGV[1] .. tag, KEYS[1])
+end
+return repaired
+"""
+
+
 class RedisTagMixin:
     """
     Common logic for working with tags in Redis (sync/async).
@@ -21,19 +64,34 @@ class RedisTagMixin:
         value_prefix: str = "rc:",
         meta_prefix: str = "rcmeta",
         pickle_protocol: int = pickle.HIGHEST_PROTOCOL,
+        serializer: Optional[Callable[[Any], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], Any]] = None,
     ) -> None:
+        if (serializer is None) != (deserializer is None):
+            raise ValueError("serializer and deserializer must be provided together")
+
         self.value_prefix = value_prefix.rstrip(":") + ":"
         self.meta_prefix = meta_prefix.rstrip(":")
         self.pickle_protocol = pickle_protocol
+        self.serializer = serializer
+        self.deserializer = deserializer
 
     def _ktags_key(self, value_key: str) -> str:
         """Key for storing tags of a specific cache key."""
         h = hashlib.sha1(value_key.encode("utf-8")).hexdigest()
-        return f"{self.meta_prefix}:kt:{h}"
+        return f"{self._ktags_prefix()}{h}"
 
     def _tagset_key(self, tag: str) -> str:
         """Key for storing set of keys with a specific tag."""
-        return f"{self.meta_prefix}:tag:{tag}"
+        return f"{self._tagset_prefix()}{tag}"
+
+    def _tagset_prefix(self) -> str:
+        """Prefix of tagsets; must match _tagset_key (used by Lua)."""
+        return f"{self.meta_prefix}:tag:"
+
+    def _ktags_prefix(self) -> str:
+        """Prefix of per-key tag sets; must match _ktags_key (used by Lua)."""
+        return f"{self.meta_prefix}:kt:"
 
     def _calculate_ttl(self, ttl: float) -> tuple[Optional[int], Optional[int]]:
         """Calculate ex/px parameters for Redis SET command."""
@@ -43,16 +101,47 @@ class RedisTagMixin:
             return None, int(round(ttl * 1000))
 
     def _serialize_value(self, value: Any) -> bytes:
-        """Serialize value for Redis storage."""
-        return pickle.dumps(value, protocol=self.pickle_protocol)
+        """
+        Serialize value for Redis storage.
+        With a custom serializer the payload is tagged (b"S" custom, b"P" pickle)
+        and values the serializer rejects fall back to pickle.
+        Tuple subclasses (namedtuples such as the decorator's XFetchEntry) are
+        always pickled: JSON/msgpack would silently flatten them to arrays.
+        """
+        if self.serializer is None:
+            return pickle.dumps(value, protocol=self.pickle_protocol)
+        if isinstance(value, tuple) and type(value) is not tuple:
+            return _TAG_PICKLE + pickle.dumps(value, protocol=self.pickle_protocol)
+        try:
+            return _TAG_CUSTOM + self.serializer(value)
+        except Exception:
+            return _TAG_PICKLE + pickle.dumps(value, protocol=self.pickle_protocol)
 
     def _deserialize_value(self, blob: bytes) -> Any:
         """Deserialize value from Redis."""
+        if self.deserializer is None:
+            return pickle.loads(blob)
+        tag = blob[:1]
+        if tag == _TAG_CUSTOM:
+            return self.deserializer(blob[1:])
+        if tag == _TAG_PICKLE:
+            return pickle.loads(blob[1:])
+        # Untagged payload written before a serializer was configured
         return pickle.loads(blob)
 
-    def _decode_redis_strings(self, items: Set[bytes]) -> Set[str]:
+    def _decode_redis_strings(self, items: Set[Union[bytes, str]]) -> Set[str]:
         """Decode strings from Redis (bytes -> str)."""
-        return {b.decode("utf-8") for b in items} if items else set()
+        if not items:
+            return set()
+        return {b.decode("utf-8") if isinstance(b, (bytes, bytearray)) else b for b in items}
+
+    @staticmethod
+    def _check_raw_responses(client: Union[Redis, AsyncRedis]) -> None:
+        """Values are stored as raw bytes, so replies must not be decoded to str."""
+        pool = getattr(client, "connection_pool", None)
+        kwargs = getattr(pool, "connection_kwargs", None) or {}
+        if kwargs.get("decode_responses"):
+            raise ValueError("Redis client must be created with decode_responses=False")
 
     def _validate_ttl(self, ttl: float) -> None:
         """Validate TTL parameter."""
@@ -83,12 +172,18 @@ class RedisTagMixin:
         ex: Optional[int],
         px: Optional[int],
         kt_key: str,
-        tags: Optional[Iterable[str]]
+        tags: Optional[set[str]]
     ):
-        """Prepare pipeline for SET operation with reading old tags."""
+        """
+        Prepare pipeline for SET operation: write the value, read old tags and
+        index the new ones, so a plain tagged set costs a single round trip.
+        """
         pipeline.set(name=key, value=blob, ex=ex, px=px)
         if tags is not None:
+            # Read old tags before the new ones are merged in
             pipeline.smembers(kt_key)
+            if tags:
+                self._prepare_add_tags_pipeline(pipeline, key, kt_key, tags, ex, px)
 
     def _extract_old_tags_from_pipeline_result(
         self,
@@ -141,21 +236,18 @@ class RedisTagMixin:
         results: list,
         kt_key: str
     ):
-        """Second pass of tag removal - remove empty tagsets."""
+        """Second pass of tag removal - remove empty tagsets and unlink tags from the key."""
         for i, tag in enumerate(tags_to_remove):
             scard_idx = i * 2 + 1  # scard results come after srem
             if scard_idx < len(results) and results[scard_idx] == 0:
                 pipeline.delete(self._tagset_key(tag))
 
         if tags_to_remove:
-            pipeline.delete(kt_key)
-
-    def _calculate_tags_diff(self, old_tags: set[str], new_tags: Iterable[str]) -> tuple[set[str], set[str]]:
-        """Calculate difference between old and new tags."""
-        new_tags_set = set(new_tags)
-        tags_to_remove = old_tags - new_tags_set
-        tags_to_add = new_tags_set - old_tags
-        return tags_to_remove, tags_to_add
+            pipeline.srem(kt_key, *list(tags_to_remove))
+
+    def _calculate_tags_to_remove(self, old_tags: set[str], new_tags: Iterable[str]) -> set[str]:
+        """Old tags that are no longer attached to the key."""
+        return old_tags - set(new_tags)
 
 
 class RedisPatternMixin:
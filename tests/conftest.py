@@ -1,10 +1,20 @@
 import os
 import pytest
 import threading
-from redis import Redis
+from redis import ConnectionPool, Redis
 from custom_cache import InMemoryCache
 from custom_cache import RedisCache
 
+# One pool per test session: fixtures borrow connections instead of reconnecting.
+_POOL = ConnectionPool(
+    host=os.getenv("TEST_REDIS_HOST", "localhost"),
+    port=int(os.getenv("TEST_REDIS_PORT", "6379")),
+    db=15,
+    decode_responses=False,
+    socket_connect_timeout=0.2,
+    max_connections=32,
+)
+
 
 @pytest.fixture
 def mem_cache():
@@ -13,10 +23,8 @@ def mem_cache():
 
 @pytest.fixture(scope="session")
 def redis_client():
-    host = os.getenv("TEST_REDIS_HOST", "localhost")
-    port = int(os.getenv("TEST_REDIS_PORT", "6379"))
     try:
-        r = Redis(host=host, port=port, db=15, decode_responses=False, socket_connect_timeout=0.2)
+        r = Redis(connection_pool=_POOL)
         r.ping()
         return r
     except Exception:
@@ -15,7 +15,7 @@ async def test_aioredis_cache_basic():
     except Exception:
         pytest.skip("redis not available")
 
-    backend = AioredisCache(r, value_prefix="rc:test:", meta_prefix="rcmeta:test")
+    backend = AioredisCache(r, value_prefix="rc:test:", meta_prefix="rcmeta:test", default_ttl=5.0)
     await backend.aclear()
 
     calls = {"n": 0}
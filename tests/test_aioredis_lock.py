@@ -3,6 +3,7 @@ import pytest
 import hashlib
 from redis.asyncio import Redis
 from custom_cache import AioredisCache, cache, AsyncRedisKeyLock, KeyBuilder
+from custom_cache.utils import make_async_redis_lock
 
 
 @pytest.mark.asyncio
@@ -13,7 +14,7 @@ async def test_distributed_singleflight_with_async_lock():
     except Exception:
         pytest.skip("redis not available")
 
-    backend = AioredisCache(r, value_prefix="rc:test:", meta_prefix="rcmeta:test")
+    backend = AioredisCache(r, value_prefix="rc:test:", meta_prefix="rcmeta:test", default_ttl=5.0)
     await backend.aclear()
 
     calls = {"n": 0}
@@ -48,4 +49,77 @@ async def test_distributed_singleflight_with_async_lock():
     assert calls["n"] == 1
 
     await backend.aclear()
-    await r.aclose()
\ No newline at end of file
+    await r.aclose()
+
+
+async def _connect() -> Redis:
+    r = Redis(host="localhost", port=6379, db=13, decode_responses=False)
+    try:
+        await r.ping()
+    except Exception:
+        pytest.skip("redis not available")
+    return r
+
+
+@pytest.mark.asyncio
+async def test_acquire_or_get_lead_wait_hit():
+    r = await _connect()
+    await r.delete("rc:test:v", "rcmeta:test:lock:v")
+
+    leader = AsyncRedisKeyLock(r, "rcmeta:test:lock:v", ttl_ms=2000, timeout_sec=1.0)
+    assert await leader.acquire_or_get("rc:test:v") is None
+    assert leader.token is not None  # LEAD
+
+    waiter = AsyncRedisKeyLock(r, "rcmeta:test:lock:v", ttl_ms=2000, timeout_sec=1.0)
+    task = asyncio.create_task(waiter.acquire_or_get("rc:test:v"))
+    await asyncio.sleep(0.05)
+    assert not task.done()  # WAIT while the leader holds the lock
+
+    await r.set("rc:test:v", b"payload")
+    assert await task == b"payload"  # HIT as soon as the value appears
+    assert waiter.token is None
+
+    # value gone, lock still held: gives up after timeout_sec without the lock
+    await r.delete("rc:test:v")
+    late = AsyncRedisKeyLock(r, "rcmeta:test:lock:v", ttl_ms=2000, timeout_sec=0.05)
+    assert await late.acquire_or_get("rc:test:v") is None
+    assert late.token is None
+
+    await leader.release()
+    assert not await r.exists("rcmeta:test:lock:v")
+    await r.aclose()
+
+
+@pytest.mark.asyncio
+async def test_dist_lock_timeout_and_stale_refresh():
+    r = await _connect()
+    backend = AioredisCache(r, value_prefix="rc:test:", meta_prefix="rcmeta:test", default_ttl=5.0)
+    await backend.aclear()
+
+    calls = {"n": 0}
+
+    # huge beta: every hit is inside the early-refresh window
+    @cache(ttl=2.0, backend=backend, key=lambda x: f"rc:test:h:{x}", distributed_singleflight=True,
+           dist_lock_timeout=0.1, early_refresh=True, early_refresh_beta=1e9)
+    async def heavy(x: int):
+        calls["n"] += 1
+        return x * 2
+
+    other = make_async_redis_lock(backend, "rc:test:h:1", 5.0, 0.1)
+    assert await other.acquire()  # another process is computing
+    try:
+        # no value and the lock never frees: compute locally after dist_lock_timeout
+        assert await heavy(1) == 2
+        assert calls["n"] == 1
+
+        # live value due for refresh: serve it stale instead of waiting
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await heavy(1) == 2
+        assert loop.time() - started < 0.05
+        assert calls["n"] == 1
+    finally:
+        await other.release()
+
+    await backend.aclear()
+    await r.aclose()
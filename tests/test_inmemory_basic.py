@@ -1,6 +1,8 @@
 import time
 
-from custom_cache import cache
+import pytest
+
+from custom_cache import cache, InMemoryCache
 
 
 def test_basic_set_get(mem_cache):
@@ -47,3 +49,185 @@ def test_none_value_cached(mem_cache):
     time.sleep(0.45)
     assert maybe_none(True) is None
     assert calls["n"] == 2
+
+
+def test_set_many_and_tags(mem_cache):
+    mem_cache.set_many([
+        ("a", 1, 1.0, ["t1", "t2"]),
+        ("b", 2, 1.0, ["t2"]),
+        ("c", 3, 1.0, None),
+    ])
+    assert mem_cache["a"] == 1
+    assert mem_cache["b"] == 2
+    assert mem_cache["c"] == 3
+
+    mem_cache.invalidate_tags(["t2"])
+    assert "a" not in mem_cache
+    assert "b" not in mem_cache
+    assert mem_cache["c"] == 3
+
+
+def test_early_refresh(mem_cache):
+    calls = {"n": 0}
+
+    @cache(ttl=5, backend=mem_cache, early_refresh=True)
+    def f(x):
+        calls["n"] += 1
+        time.sleep(0.01)
+        return x * 2
+
+    # far from expiry: served from cache
+    assert f(2) == 4
+    assert f(2) == 4
+    assert calls["n"] == 1
+
+    # huge beta: every hit is treated as inside the refresh window
+    @cache(ttl=5, backend=mem_cache, early_refresh=True, early_refresh_beta=1e9)
+    def g(x):
+        calls["n"] += 1
+        time.sleep(0.01)
+        return x * 3
+
+    assert g(2) == 6
+    assert g(2) == 6
+    assert calls["n"] == 3
+
+
+def test_disabled_via_env(monkeypatch):
+    monkeypatch.setenv("RELAYCACHE_DISABLED", "1")
+    created = []
+
+    def factory():
+        created.append(1)
+        return InMemoryCache(default_ttl=1.0)
+
+    def f(x):
+        return x
+
+    assert cache(ttl=1.0, backend=factory)(f) is f
+    assert created == []
+
+    monkeypatch.setenv("RELAYCACHE_DISABLED", "0")
+    wrapped = cache(ttl=1.0, backend=factory)(f)
+    assert wrapped is not f
+    assert wrapped(1) == 1
+    assert created == [1]
+
+
+def test_duck_typed_backend():
+    class DictBackend:
+        def __init__(self):
+            self.data = {}
+
+        def get(self, key):
+            return (key in self.data), self.data.get(key)
+
+        def set(self, key, value, ttl, *, tags=None):
+            self.data[key] = value
+
+    backend = DictBackend()
+    calls = {"n": 0}
+
+    @cache(ttl=1.0, backend=backend)
+    def f(x):
+        calls["n"] += 1
+        return x
+
+    assert f(1) == 1
+    assert f(1) == 1
+    assert calls["n"] == 1
+    assert len(backend.data) == 1
+
+
+def test_tag_templates(mem_cache):
+    calls = {"n": 0}
+
+    @cache(ttl=1.0, backend=mem_cache, tags=("user:{uid}", "region:{region}", "users"))
+    def load(uid, region="eu"):
+        calls["n"] += 1
+        return uid
+
+    assert load(1) == 1
+    assert load(2, region="us") == 2
+    assert calls["n"] == 2
+
+    mem_cache.invalidate_tags(["region:eu"])
+    assert load(1) == 1
+    assert load(2, region="us") == 2
+    assert calls["n"] == 3
+
+    mem_cache.invalidate_tags(["users"])
+    load(1)
+    load(2, region="us")
+    assert calls["n"] == 5
+
+
+def test_tag_template_argument_sources():
+    from types import SimpleNamespace
+
+    from custom_cache.utils import make_tag_resolver
+
+    def f(uid, region="eu", *, user=None):
+        pass
+
+    resolve = make_tag_resolver(("u:{uid}", "r:{region}", "n:{user.name!r}", "p:{uid:>3}", 7), f)
+    user = SimpleNamespace(name="ann")
+    assert resolve((1,), {"user": user}) == ["u:1", "r:eu", "n:'ann'", "p:  1", 7]
+    assert resolve((), {"uid": 2, "region": "us", "user": user}) == ["u:2", "r:us", "n:'ann'", "p:  2", 7]
+
+    # *args/**kwargs signatures bind per call
+    def g(uid, *args, **kwargs):
+        pass
+
+    assert make_tag_resolver(("u:{uid}", "k:{kwargs}"), g)((3, 4), {"x": 1}) == ["u:3", "k:{'x': 1}"]
+
+
+def test_tag_templates_validation(mem_cache):
+    # unknown template field is rejected at decoration time, not on every call
+    with pytest.raises(ValueError):
+        cache(ttl=1.0, backend=mem_cache, tags=("user:{uid}",))(lambda user_id: user_id)
+
+    calls = {"n": 0}
+
+    # non-str tags and escaped braces are static
+    @cache(ttl=1.0, backend=mem_cache, tags=[1, "set:{{x}}"])
+    def f(x):
+        calls["n"] += 1
+        return x
+
+    f(1)
+    mem_cache.invalidate_tags([1])
+    f(1)
+    mem_cache.invalidate_tags(["set:{x}"])
+    f(1)
+    assert calls["n"] == 3
+
+
+def test_max_size_evicts_oldest():
+    c = InMemoryCache(default_ttl=10, max_size=2)
+    c.set("a", 1, ttl=10, tags=["t"])
+    c.set("b", 2, ttl=10)
+    c.set("c", 3, ttl=10)
+    assert "a" not in c
+    assert c["b"] == 2 and c["c"] == 3
+    assert c.stats()["total_tags"] == 0
+
+
+def test_tinylfu_admission():
+    c = InMemoryCache(default_ttl=10, max_size=2, admission="tinylfu")
+    c.set("hot", 1, ttl=10)
+    c.set("warm", 2, ttl=10)
+    for _ in range(5):
+        c.get("hot")
+        c.get("warm")
+
+    # one-shot key is colder than the eviction victim: not admitted
+    c.set("once", 3, ttl=10)
+    assert "once" not in c
+    assert "hot" in c and "warm" in c
+
+    for _ in range(10):
+        c.get("newhot")
+    c.set("newhot", 4, ttl=10)
+    assert c["newhot"] == 4
+    assert c.stats()["total_keys"] == 2
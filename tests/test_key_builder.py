@@ -0,0 +1,29 @@
+from custom_cache import KeyBuilder
+
+
+def _func(a, b=0, c=None):
+    return a
+
+
+_func.__module__ = "app.users"
+
+
+def test_key_is_stable():
+    # Pinned to the keys of earlier releases: a change here splits caches
+    # shared between deployed versions
+    kb = KeyBuilder()
+    assert kb.build(_func, (1,), {}) == (
+        "rc:app.users._func:fc7e0cc24a6f26d3f0b267dbd7daf20fc2034d950195a3fb7c8fca308b76304b"
+    )
+    assert kb.build(_func, (1,), {"b": 2, "c": "x"}) == (
+        "rc:app.users._func:5c98ffcc22f0b9ba147b24fa65ac9a9e30eae56b7ac4510dabbbb3f4fc22109c"
+    )
+
+
+def test_kwargs_order_independent():
+    kb = KeyBuilder(namespace="v1")
+    k1 = kb.build(_func, (1,), {"b": 2, "c": "x"})
+    k2 = kb.build(_func, (1,), {"c": "x", "b": 2})
+    assert k1 == k2
+    assert kb.for_func(_func)((1,), {"c": "x", "b": 2}) == k1
+    assert k1.startswith("rc:v1:app.users._func:")
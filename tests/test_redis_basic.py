@@ -1,6 +1,7 @@
 import pytest
 from custom_cache import cache
 from custom_cache import invalidate
+from custom_cache import RedisCache
 
 
 @pytest.mark.integration
@@ -32,3 +33,150 @@ def test_redis_mapping_and_contains(redis_cache):
     redis_cache["k"] = {"v": 1}  # default_ttl используется
     assert "k" in redis_cache
     assert redis_cache["k"] == {"v": 1}
+
+
+@pytest.mark.integration
+def test_redis_custom_serializer(redis_client):
+    import json
+
+    cache_ = RedisCache(
+        redis_client,
+        default_ttl=2.0,
+        value_prefix="rc:test:",
+        meta_prefix="rcmeta:test",
+        serializer=lambda v: json.dumps(v).encode("utf-8"),
+        deserializer=json.loads,
+    )
+    cache_.clear()
+    try:
+        cache_.set("rc:test:json", {"id": 1}, ttl=2.0)
+        assert redis_client.get("rc:test:json") == b'S{"id": 1}'
+        assert cache_.get("rc:test:json") == (True, {"id": 1})
+
+        # not JSON-serializable -> pickle fallback
+        cache_.set("rc:test:set", {1, 2}, ttl=2.0)
+        assert redis_client.get("rc:test:set")[:1] == b"P"
+        assert cache_.get("rc:test:set") == (True, {1, 2})
+    finally:
+        cache_.clear()
+
+
+@pytest.mark.integration
+def test_redis_custom_serializer_with_early_refresh(redis_client):
+    import json
+
+    backend = RedisCache(
+        redis_client,
+        default_ttl=2.0,
+        value_prefix="rc:test:",
+        meta_prefix="rcmeta:test",
+        serializer=lambda v: json.dumps(v).encode("utf-8"),
+        deserializer=json.loads,
+    )
+    backend.clear()
+    try:
+        @cache(ttl=2.0, backend=backend, early_refresh=True)
+        def f(x):
+            return {"x": x}
+
+        assert f(1) == {"x": 1}
+        # the XFetch envelope must not be flattened into a JSON array
+        assert f(1) == {"x": 1}
+    finally:
+        backend.clear()
+
+
+@pytest.mark.integration
+def test_redis_early_refresh_serves_stale_while_locked(redis_cache):
+    import time
+    from custom_cache.utils import make_sync_redis_lock
+
+    calls = {"n": 0}
+
+    # huge beta: every hit is inside the refresh window
+    @cache(ttl=2.0, backend=redis_cache, key=lambda x: f"rc:test:er:{x}", early_refresh=True,
+           early_refresh_beta=1e9, distributed_singleflight=True, dist_lock_timeout=2.0)
+    def f(x):
+        calls["n"] += 1
+        return x * 2
+
+    assert f(1) == 2
+
+    other = make_sync_redis_lock(redis_cache, "rc:test:er:1", 5.0, 0.1)
+    assert other.acquire()  # another process is refreshing
+    try:
+        started = time.monotonic()
+        assert f(1) == 2
+        assert time.monotonic() - started < 0.5  # no wait for the foreign lock
+        assert calls["n"] == 1
+    finally:
+        other.release()
+
+
+@pytest.mark.integration
+def test_redis_tag_membership_repair(redis_client):
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    cache_ = RedisCache(
+        redis_client,
+        default_ttl=2.0,
+        value_prefix="rc:test:",
+        meta_prefix="rcmeta:test",
+        tag_validate_prob=1.0,
+        tag_validate_executor=executor,
+    )
+    cache_.clear()
+    try:
+        cache_.set("rc:test:k", 1, ttl=2.0, tags=["a", "b"])
+        # simulate a lost tag-index entry
+        redis_client.srem(cache_._tagset_key("a"), "rc:test:k")
+
+        assert cache_.get("rc:test:k") == (True, 1)
+        executor.shutdown(wait=True)
+        assert redis_client.sismember(cache_._tagset_key("a"), "rc:test:k")
+
+        cache_.invalidate_tags(["a"])
+        assert "rc:test:k" not in cache_
+
+        # a check that lands after the value is gone must not re-create its tagset
+        cache_.set("rc:test:gone", 1, ttl=2.0, tags=["g"])
+        redis_client.delete("rc:test:gone", cache_._tagset_key("g"))
+        cache_._verify_tag_membership("rc:test:gone")
+        assert not redis_client.exists(cache_._tagset_key("g"))
+
+        # hits keep working once the validation executor is shut down
+        cache_.set("rc:test:k", 2, ttl=2.0, tags=["a"])
+        assert cache_.get("rc:test:k") == (True, 2)
+    finally:
+        cache_.clear()
+
+
+@pytest.mark.integration
+def test_redis_retag_keeps_shared_tags(redis_cache):
+    redis_cache.set("rc:test:k", 1, ttl=2.0, tags=["a", "b"])
+    redis_cache.set("rc:test:k", 2, ttl=2.0, tags=["b", "c"])
+
+    assert redis_cache.r.smembers(redis_cache._ktags_key("rc:test:k")) == {b"b", b"c"}
+    assert not redis_cache.r.exists(redis_cache._tagset_key("a"))
+
+    redis_cache.invalidate_tags(["b"])
+    assert "rc:test:k" not in redis_cache
+
+
+@pytest.mark.integration
+def test_redis_set_with_tag_iterator(redis_cache):
+    redis_cache.set("rc:test:k", 1, ttl=2.0, tags=["a"])
+    redis_cache.set("rc:test:k", 2, ttl=2.0, tags=(t for t in ["a"]))
+
+    assert redis_cache.r.smembers(redis_cache._ktags_key("rc:test:k")) == {b"a"}
+
+    redis_cache.invalidate_tags(["a"])
+    assert "rc:test:k" not in redis_cache
+
+
+def test_redis_rejects_decoded_client():
+    from redis import Redis
+
+    with pytest.raises(ValueError):
+        RedisCache(Redis(decode_responses=True), default_ttl=1.0)
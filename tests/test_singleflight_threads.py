@@ -1,6 +1,9 @@
+import asyncio
 import threading
 import time
 
+import pytest
+
 from custom_cache import cache, InMemoryCache
 
 
@@ -26,3 +29,48 @@ def test_singleflight_threads():
     assert results == [20] * 8
     # должно посчитаться ровно один раз
     assert calls["n"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_inflight_dedup():
+    class CountingCache(InMemoryCache):
+        gets = 0
+
+        def get(self, key):
+            CountingCache.gets += 1
+            return super().get(key)
+
+    backend = CountingCache(default_ttl=1.0)
+    calls = {"n": 0}
+
+    @cache(ttl=0.5, backend=backend)
+    async def slow(x):
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        return x * 2
+
+    assert await asyncio.gather(*[slow(10) for _ in range(5)]) == [20] * 5
+    assert calls["n"] == 1
+    # duplicates waited on the leader instead of reading the backend
+    assert CountingCache.gets == 1
+
+
+@pytest.mark.asyncio
+async def test_async_leader_cancel_does_not_cancel_waiters(mem_cache):
+    calls = {"n": 0}
+
+    @cache(ttl=1.0, backend=mem_cache)
+    async def slow(x):
+        calls["n"] += 1
+        await asyncio.sleep(0.2)
+        return x * 2
+
+    res = await asyncio.gather(
+        asyncio.wait_for(slow(3), 0.05),
+        asyncio.wait_for(slow(3), 1.0),
+        return_exceptions=True,
+    )
+    assert isinstance(res[0], asyncio.TimeoutError)
+    # the waiter took over the computation instead of being cancelled with the leader
+    assert res[1] == 6
+    assert calls["n"] == 2